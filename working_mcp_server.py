@@ -8,9 +8,165 @@ import json
 import sys
 import os
 import base64
+import concurrent.futures
+import http.client
+import urllib.parse
 import urllib.request
 import ssl
-from typing import Dict, Any, Optional
+import stat
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+
+# Largest JSON-RPC message accepted on stdin
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+# Most responses kept in the TTL cache
+MAX_CACHE_ENTRIES = 128
+
+# Shared encoders; reused so json.dumps does not build a new encoder for
+# non-default options on every call
+_encode_message = json.JSONEncoder(separators=(',', ':')).encode
+_encode_pretty = json.JSONEncoder(indent=2).encode
+
+# Schema fragment shared by the tools that include recent DAG runs
+_RUN_LIMIT_PROPERTY = {
+    "type": "integer",
+    "description": "Number of latest DAG runs to include",
+    "default": 5
+}
+
+# Tool catalog returned by tools/list; static, so built once at import
+TOOLS = [
+    {
+        "name": "list_dags",
+        "description": "List all DAGs in Airflow",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": "Number of DAGs to return",
+                    "default": 100
+                }
+            }
+        }
+    },
+    {
+        "name": "get_dag_overview",
+        "description": "Get a DAG with its latest runs and their task instances",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "dag_id": {
+                    "type": "string",
+                    "description": "The DAG ID"
+                },
+                "run_limit": _RUN_LIMIT_PROPERTY
+            },
+            "required": ["dag_id"]
+        }
+    },
+    {
+        "name": "list_dags_with_runs",
+        "description": "List DAGs together with their latest runs",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": "Number of DAGs to return",
+                    "default": 20
+                },
+                "run_limit": _RUN_LIMIT_PROPERTY
+            }
+        }
+    },
+    {
+        "name": "get_health",
+        "description": "Get Airflow health status",
+        "inputSchema": {
+            "type": "object",
+            "properties": {}
+        }
+    }
+]
+
+# Static results, encoded once; only the request id varies per response
+_INITIALIZE_RESULT = _encode_message({
+    "protocolVersion": "2024-11-05",
+    "capabilities": {
+        "tools": {}
+    },
+    "serverInfo": {
+        "name": "airflow-mcp-server",
+        "version": "0.1.0"
+    }
+})
+_PING_RESULT = _encode_message({})
+_TOOLS_LIST_RESULT = _encode_message({"tools": TOOLS})
+
+# Python types for the JSON Schema types used in tool input schemas
+_SCHEMA_TYPES = {"integer": int, "string": str}
+
+
+def _compile_validator(schema: Dict[str, Any]) -> Callable[[Dict[str, Any]], Optional[str]]:
+    """Build a checker for a tool input schema, returning an error message or None.
+
+    Valid arguments are completed in place with the schema defaults.
+    """
+    required = tuple(schema.get("required", ()))
+    types = {name: (prop["type"], _SCHEMA_TYPES[prop["type"]]) for name, prop in schema["properties"].items()}
+    defaults = tuple((name, prop["default"]) for name, prop in schema["properties"].items() if "default" in prop)
+
+    def validate(arguments: Dict[str, Any]) -> Optional[str]:
+        if not isinstance(arguments, dict):
+            return "arguments must be an object"
+        for name in required:
+            if name not in arguments:
+                return f"missing required argument '{name}'"
+        for name, value in arguments.items():
+            if name in types:
+                type_name, expected = types[name]
+                if not isinstance(value, expected) or isinstance(value, bool):
+                    return f"argument '{name}' must be of type {type_name}"
+        for name, default in defaults:
+            if name not in arguments:
+                arguments[name] = default
+        return None
+
+    return validate
+
+
+_VALIDATORS = {tool["name"]: _compile_validator(tool["inputSchema"]) for tool in TOOLS}
+
+
+def _stdin_is_pipe() -> bool:
+    """Whether stdin is a pipe or socket that the event loop can read directly."""
+    try:
+        mode = os.fstat(sys.stdin.fileno()).st_mode
+    except (AttributeError, OSError, ValueError):
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)
+
+
+async def _skip_line(reader: asyncio.StreamReader, consumed: int):
+    """Discard an over-long line, including the part of it not yet received."""
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b'\n')
+            return
+        except asyncio.IncompleteReadError:
+            return
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+
+
+def _encode_result(msg_id: Any, result: str) -> str:
+    """Wrap a pre-encoded result in a JSON-RPC response."""
+    return f'{{"jsonrpc":"2.0","id":{_encode_message(msg_id)},"result":{result}}}'
 
 
 class AirflowMCPServer:
@@ -35,19 +191,230 @@ class AirflowMCPServer:
             self.ssl_context.check_hostname = False
             self.ssl_context.verify_mode = ssl.CERT_NONE
 
-    def make_request(self, endpoint: str) -> Dict[str, Any]:
+        # Airflow webserver address
+        url = urllib.parse.urlsplit(self.base_url)
+        self._https = url.scheme == 'https'
+        self._netloc = url.netloc
+        self._base_path = url.path
+
+        # Honor HTTP_PROXY / HTTPS_PROXY / NO_PROXY like urllib does: https is
+        # tunnelled with CONNECT, plain http sends absolute-URI requests
+        self._proxy_netloc = None
+        self._proxy_headers: Dict[str, str] = {}
+        proxy_url = urllib.request.getproxies().get(url.scheme)
+        if proxy_url and not urllib.request.proxy_bypass(url.netloc):
+            if '://' not in proxy_url:
+                proxy_url = f"http://{proxy_url}"
+            proxy = urllib.parse.urlsplit(proxy_url)
+            self._proxy_netloc = proxy.netloc.rpartition('@')[2]
+            if proxy.username is not None:
+                proxy_auth = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+                proxy_b64 = base64.b64encode(proxy_auth.encode('latin-1')).decode('ascii')
+                self._proxy_headers['Proxy-Authorization'] = f'Basic {proxy_b64}'
+            if not self._https:
+                self._base_path = f"http://{url.netloc}{url.path}"
+                self.headers.update(self._proxy_headers)
+
+        # Keep-alive connections, reused across tool calls
+        self._idle_connections: List[Tuple[http.client.HTTPConnection, float]] = []
+        self.max_keepalive = int(os.getenv('AIRFLOW_MAX_KEEPALIVE', '100'))
+        self.keepalive_expiry = float(os.getenv('AIRFLOW_KEEPALIVE_EXPIRY', '30'))
+        # Dedicated request threads; caps concurrent Airflow requests, e.g. during
+        # list_dags_with_runs fan-out, and keeps them apart from the stdin reader
+        self.max_connections = int(os.getenv('AIRFLOW_MAX_CONNECTIONS', '10'))
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_connections)
+
+        # Short-lived response cache for slowly changing endpoints
+        self.dags_cache_ttl = float(os.getenv('AIRFLOW_CACHE_TTL_DAGS', '10'))
+        self.health_cache_ttl = float(os.getenv('AIRFLOW_CACHE_TTL_HEALTH', '5'))
+        self._cache: Dict[str, Tuple[float, bytes, Optional[str], Optional[str]]] = {}
+        self._in_flight: Dict[str, concurrent.futures.Future] = {}
+        self._cache_lock = threading.Lock()
+
+        # Tool results are sent compact unless pretty-printing is asked for
+        self.pretty = os.getenv('MCP_PRETTY', 'false').lower() == 'true'
+
+        # Responses are written unflushed and flushed together on the next loop turn
+        self._flush_scheduled = False
+
+        # JSON-RPC method -> handler, looked up once per message
+        self._method_handlers: Dict[str, Callable[[Any, Dict[str, Any]], Awaitable[Union[str, Dict[str, Any]]]]] = {
+            "initialize": self._handle_initialize,
+            "ping": self._handle_ping,
+            "tools/list": self._handle_tools_list,
+            "tools/call": self._handle_tools_call,
+        }
+
+        # Tool name -> handler, looked up once per tools/call
+        self._tool_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Union[str, Dict[str, Any]]]]] = {
+            "list_dags": self._list_dags,
+            "get_dag_overview": self._get_dag_overview,
+            "list_dags_with_runs": self._list_dags_with_runs,
+            "get_health": self._get_health,
+        }
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        """Open a new connection to the Airflow webserver."""
+        if self._https:
+            if self._proxy_netloc is None:
+                return http.client.HTTPSConnection(self._netloc, timeout=30, context=self.ssl_context)
+            conn = http.client.HTTPSConnection(self._proxy_netloc, timeout=30, context=self.ssl_context)
+            conn.set_tunnel(self._netloc, headers=self._proxy_headers)
+            return conn
+        return http.client.HTTPConnection(self._proxy_netloc or self._netloc, timeout=30)
+
+    def _get(self, path: str, extra_headers: Optional[Dict[str, str]] = None) -> Tuple[http.client.HTTPResponse, bytes]:
+        """GET a path over a pooled connection, returning the response and its body."""
+        headers = {**self.headers, **extra_headers} if extra_headers else self.headers
+        conn = self._acquire_connection()
+        reused = conn is not None
+        if conn is None:
+            conn = self._new_connection()
+
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except ConnectionError:
+            conn.close()
+            if not reused:
+                raise
+            # The server dropped an idle keep-alive connection; retry on a fresh one
+            conn = self._new_connection()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        if response.will_close or len(self._idle_connections) >= self.max_keepalive:
+            conn.close()
+        else:
+            self._idle_connections.append((conn, time.monotonic()))
+        return response, body
+
+    def _acquire_connection(self) -> Optional[http.client.HTTPConnection]:
+        """Take an idle connection from the pool, dropping any past keepalive_expiry."""
+        now = time.monotonic()
+        # The oldest connections sit at the front; close those that have expired
+        try:
+            while now - self._idle_connections[0][1] >= self.keepalive_expiry:
+                self._idle_connections.pop(0)[0].close()
+        except IndexError:
+            pass
+
+        while True:
+            try:
+                conn, idle_since = self._idle_connections.pop()
+            except IndexError:
+                return None
+            if now - idle_since < self.keepalive_expiry:
+                return conn
+            conn.close()
+
+    def _fetch_body(self, endpoint: str, ttl: float) -> bytes:
+        """GET an endpoint's raw body, serving from cache for up to ttl seconds.
+
+        Concurrent misses for the same endpoint share a single request.
+        """
+        if ttl <= 0:
+            return self._download(endpoint, None)[0]
+
+        with self._cache_lock:
+            cached = self._cache.get(endpoint)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+            in_flight = self._in_flight.get(endpoint)
+            owner = in_flight is None
+            if owner:
+                in_flight = self._in_flight[endpoint] = concurrent.futures.Future()
+
+        if not owner:
+            return in_flight.result()
+
+        try:
+            body, etag, last_modified = self._download(endpoint, cached)
+            with self._cache_lock:
+                self._store_in_cache(endpoint, (time.monotonic() + ttl, body, etag, last_modified))
+            in_flight.set_result(body)
+            return body
+        except BaseException as e:
+            in_flight.set_exception(e)
+            raise
+        finally:
+            with self._cache_lock:
+                del self._in_flight[endpoint]
+
+    def _download(self, endpoint: str, cached: Optional[Tuple[float, bytes, Optional[str], Optional[str]]]) -> Tuple[bytes, Optional[str], Optional[str]]:
+        """GET an endpoint, returning its body, ETag and Last-Modified.
+
+        An expired cache entry is revalidated with If-None-Match / If-Modified-Since
+        when Airflow sent an ETag or Last-Modified, so an unchanged body comes back as 304.
+        """
+        validators = {}
+        if cached is not None:
+            if cached[2]:
+                validators['If-None-Match'] = cached[2]
+            if cached[3]:
+                validators['If-Modified-Since'] = cached[3]
+
+        response, body = self._get(f"{self._base_path}{endpoint}", validators)
+        if response.status == 304 and cached is not None:
+            return cached[1], response.getheader('ETag') or cached[2], response.getheader('Last-Modified') or cached[3]
+
+        # Redirects are not followed, so anything but 2xx is an error
+        if not 200 <= response.status < 300:
+            raise OSError(f"HTTP Error {response.status}: {response.reason}")
+        # Bodies may be passed through undecoded, so make sure they are JSON
+        content_type = (response.getheader('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type != 'application/json' and not content_type.endswith('+json'):
+            raise ValueError(f"unexpected Content-Type: {content_type or 'none'}")
+        return body, response.getheader('ETag'), response.getheader('Last-Modified')
+
+    def _store_in_cache(self, endpoint: str, entry: Tuple[float, bytes, Optional[str], Optional[str]]):
+        """Add a cache entry, dropping expired entries that cannot be revalidated.
+
+        At most MAX_CACHE_ENTRIES are kept; the entry closest to expiry is evicted first.
+        """
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _, etag, last_modified) in self._cache.items()
+                    if expires_at <= now and not etag and not last_modified]:
+            del self._cache[key]
+        if endpoint not in self._cache and len(self._cache) >= MAX_CACHE_ENTRIES:
+            del self._cache[min(self._cache, key=lambda key: self._cache[key][0])]
+        self._cache[endpoint] = entry
+
+    def make_request(self, endpoint: str, ttl: float = 0) -> Dict[str, Any]:
         """Make HTTP request to Airflow API."""
-        url = f"{self.base_url}{endpoint}"
-        req = urllib.request.Request(url, headers=self.headers)
+        try:
+            return json.loads(self._fetch_body(endpoint, ttl))
+        except Exception as e:
+            return {"error": f"API request failed: {str(e)}"}
 
+    def make_raw_request(self, endpoint: str, ttl: float = 0) -> Union[str, Dict[str, Any]]:
+        """Make HTTP request to Airflow API, returning the JSON body text undecoded."""
         try:
-            with urllib.request.urlopen(req, context=self.ssl_context, timeout=30) as response:
-                return json.loads(response.read().decode('utf-8'))
+            return self._fetch_body(endpoint, ttl).decode('utf-8')
         except Exception as e:
             return {"error": f"API request failed: {str(e)}"}
 
-    async def handle_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Handle incoming MCP messages."""
+    def close(self):
+        """Stop the request threads and close pooled connections."""
+        self._executor.shutdown(wait=False)
+        while self._idle_connections:
+            conn, _ = self._idle_connections.pop()
+            conn.close()
+
+    async def handle_message(self, message: Dict[str, Any]) -> Optional[Union[str, Dict[str, Any]]]:
+        """Handle incoming MCP messages.
+
+        Responses with a static result are returned already encoded as a string.
+        """
         method = message.get("method")
         msg_id = message.get("id")
 
@@ -56,140 +423,255 @@ class AirflowMCPServer:
         if msg_id is None:
             return None
 
-        if method == "initialize":
+        handler = self._method_handlers.get(method) if isinstance(method, str) else None
+        if handler is None:
             return {
                 "jsonrpc": "2.0",
                 "id": msg_id,
-                "result": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {
-                        "tools": {}
-                    },
-                    "serverInfo": {
-                        "name": "airflow-mcp-server",
-                        "version": "0.1.0"
-                    }
+                "error": {
+                    "code": -32601,
+                    "message": f"Method not found: {method}"
                 }
             }
+        return await handler(msg_id, message)
 
-        elif method == "ping":
-            return {
-                "jsonrpc": "2.0",
-                "id": msg_id,
-                "result": {}
-            }
+    async def _handle_initialize(self, msg_id: Any, message: Dict[str, Any]) -> str:
+        return _encode_result(msg_id, _INITIALIZE_RESULT)
 
-        elif method == "tools/list":
-            tools = [
-                {
-                    "name": "list_dags",
-                    "description": "List all DAGs in Airflow",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "limit": {
-                                "type": "integer",
-                                "description": "Number of DAGs to return",
-                                "default": 100
-                            }
-                        }
-                    }
-                },
-                {
-                    "name": "get_health",
-                    "description": "Get Airflow health status",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {}
-                    }
-                }
-            ]
+    async def _handle_ping(self, msg_id: Any, message: Dict[str, Any]) -> str:
+        return _encode_result(msg_id, _PING_RESULT)
 
-            return {
-                "jsonrpc": "2.0",
-                "id": msg_id,
-                "result": {
-                    "tools": tools
-                }
-            }
+    async def _handle_tools_list(self, msg_id: Any, message: Dict[str, Any]) -> str:
+        return _encode_result(msg_id, _TOOLS_LIST_RESULT)
 
-        elif method == "tools/call":
-            params = message.get("params", {})
+    async def _handle_tools_call(self, msg_id: Any, message: Dict[str, Any]) -> Dict[str, Any]:
+        params = message.get("params", {})
+        if not isinstance(params, dict):
+            error = "params must be an object"
+        else:
             tool_name = params.get("name")
             arguments = params.get("arguments", {})
-
-            result = await self.call_tool(tool_name, arguments)
-
+            if tool_name is not None and not isinstance(tool_name, str):
+                error = "name must be a string"
+            else:
+                validate = _VALIDATORS.get(tool_name)
+                error = validate(arguments) if validate is not None else None
+        if error is not None:
             return {
                 "jsonrpc": "2.0",
                 "id": msg_id,
-                "result": {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps(result, indent=2)
-                        }
-                    ]
+                "error": {
+                    "code": -32602,
+                    "message": f"Invalid params: {error}"
                 }
             }
 
-        else:
-            return {
-                "jsonrpc": "2.0",
-                "id": msg_id,
-                "error": {
-                    "code": -32601,
-                    "message": f"Method not found: {method}"
-                }
+        result = await self.call_tool(tool_name, arguments)
+
+        return {
+            "jsonrpc": "2.0",
+            "id": msg_id,
+            "result": {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": self._tool_result_text(result)
+                    }
+                ]
             }
+        }
 
-    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
         """Execute tool calls."""
-        if tool_name == "list_dags":
-            limit = arguments.get("limit", 100)
-            return self.make_request(f"/dags?limit={limit}")
+        handler = self._tool_handlers.get(tool_name)
+        if handler is None:
+            return {"error": f"Unknown tool: {tool_name}"}
+        return await handler(arguments)
 
-        elif tool_name == "get_health":
-            return self.make_request("/health")
+    async def _list_dags(self, arguments: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+        return await self.fetch_raw(f"/dags?limit={arguments['limit']}", ttl=self.dags_cache_ttl)
 
-        else:
-            return {"error": f"Unknown tool: {tool_name}"}
+    async def _get_dag_overview(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if not arguments["dag_id"]:
+            return {"error": "dag_id is required"}
+        return await self.get_dag_overview(arguments["dag_id"], arguments["run_limit"])
 
-    async def run(self):
-        """Main server loop."""
-        while True:
+    async def _list_dags_with_runs(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.list_dags_with_runs(arguments["limit"], arguments["run_limit"])
+
+    async def _get_health(self, arguments: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+        return await self.fetch_raw("/health", ttl=self.health_cache_ttl)
+
+    def _tool_result_text(self, result: Union[str, Dict[str, Any]]) -> str:
+        """Render a tool result; raw Airflow bodies pass through unless pretty-printing."""
+        if isinstance(result, str):
+            if not self.pretty:
+                return result
             try:
-                line = await asyncio.get_event_loop().run_in_executor(
-                    None, sys.stdin.readline
-                )
+                result = json.loads(result)
+            except ValueError:
+                return result
+        return _encode_pretty(result) if self.pretty else _encode_message(result)
+
+    async def fetch(self, endpoint: str, ttl: float = 0) -> Dict[str, Any]:
+        """Run make_request on the request threads so the event loop is never blocked."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, self.make_request, endpoint, ttl)
+
+    async def fetch_raw(self, endpoint: str, ttl: float = 0) -> Union[str, Dict[str, Any]]:
+        """Run make_raw_request on the request threads."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, self.make_raw_request, endpoint, ttl)
+
+    async def get_dag_overview(self, dag_id: str, run_limit: int) -> Dict[str, Any]:
+        """Fetch a DAG, its latest runs and each run's task instances concurrently."""
+        dag_path = f"/dags/{urllib.parse.quote(dag_id, safe='')}"
+        dag, runs = await asyncio.gather(
+            self.fetch(dag_path),
+            self.fetch(f"{dag_path}/dagRuns?limit={run_limit}&order_by=-execution_date"),
+        )
+        if "error" in dag:
+            return dag
+
+        dag_runs = runs.get("dag_runs", [])
+        task_instances = await asyncio.gather(*(
+            self.fetch(f"{dag_path}/dagRuns/{urllib.parse.quote(run['dag_run_id'], safe='')}/taskInstances")
+            for run in dag_runs
+        ))
+        for run, instances in zip(dag_runs, task_instances):
+            run["task_instances"] = instances.get("task_instances", instances)
+
+        return {"dag": dag, "dag_runs": runs}
+
+    async def list_dags_with_runs(self, limit: int, run_limit: int) -> Dict[str, Any]:
+        """List DAGs, then fetch the latest runs of every DAG concurrently.
 
+        At most max_connections run lists are fetched at once, so N DAGs cost
+        about 1 + ceil(N / max_connections) round-trips.
+        """
+        dags = await self.fetch(f"/dags?limit={limit}", ttl=self.dags_cache_ttl)
+        if "error" in dags:
+            return dags
+
+        dag_list = dags.get("dags", [])
+        runs = await asyncio.gather(*(
+            self.fetch(f"/dags/{urllib.parse.quote(dag['dag_id'], safe='')}/dagRuns?limit={run_limit}&order_by=-execution_date")
+            for dag in dag_list
+        ))
+
+        for dag, dag_runs in zip(dag_list, runs):
+            dag["dag_runs"] = dag_runs.get("dag_runs", dag_runs)
+
+        return {
+            "dags": dag_list,
+            "total_entries": dags.get("total_entries")
+        }
+
+    async def read_lines(self) -> AsyncIterator[Union[str, bytes]]:
+        """Yield lines from stdin until EOF.
+
+        Pipes and sockets are read directly on the event loop; anything else (a
+        terminal, a redirected file, or Windows) falls back to blocking readline
+        calls in the executor. Lines longer than MAX_MESSAGE_SIZE are dropped.
+        """
+        loop = asyncio.get_event_loop()
+        if sys.platform == 'win32' or not _stdin_is_pipe():
+            while True:
+                line = await loop.run_in_executor(None, sys.stdin.readline)
                 if not line:
-                    break
+                    return
+                yield line
+
+        reader = asyncio.StreamReader(limit=MAX_MESSAGE_SIZE)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        while True:
+            try:
+                line = await reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                # EOF; hand over a final line that has no trailing newline
+                if e.partial:
+                    yield e.partial
+                return
+            except asyncio.LimitOverrunError as e:
+                await _skip_line(reader, e.consumed)
+                continue
+            yield line
 
+    async def respond(self, message: Dict[str, Any]):
+        """Handle one message and write its response, if any."""
+        try:
+            response = await self.handle_message(message)
+        except Exception as e:
+            # Never leave a request unanswered; notifications stay silent
+            if message.get("id") is None:
+                return
+            response = {
+                "jsonrpc": "2.0",
+                "id": message["id"],
+                "error": {
+                    "code": -32603,
+                    "message": f"Internal error: {str(e)}"
+                }
+            }
+
+        # Only write back if there's a response
+        # Notifications return None and must be silently ignored
+        if response is not None:
+            if not isinstance(response, str):
+                response = _encode_message(response)
+            print(response)
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Flush stdout once the event loop is idle, coalescing back-to-back responses."""
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_event_loop().call_soon(self._flush_stdout)
+
+    def _flush_stdout(self):
+        self._flush_scheduled = False
+        sys.stdout.flush()
+
+    async def run(self):
+        """Main server loop.
+
+        Each message is handled in its own task, so a slow tool call does not
+        hold up messages read after it; responses are matched by id.
+        """
+        pending = set()
+        try:
+            async for line in self.read_lines():
                 line = line.strip()
                 if not line:
                     continue
 
                 try:
                     message = json.loads(line)
-                    response = await self.handle_message(message)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
 
-                    # Only write back if there's a response
-                    # Notifications return None and must be silently ignored
-                    if response is not None:
-                        print(json.dumps(response), flush=True)
+                task = asyncio.ensure_future(self.respond(message))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
 
-                except json.JSONDecodeError:
-                    continue
+        except Exception:
+            # Unreadable input ends the session, same as EOF
+            pass
 
-            except Exception:
-                break
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        sys.stdout.flush()
 
 
 async def main():
     """Entry point."""
     server = AirflowMCPServer()
-    await server.run()
+    try:
+        await server.run()
+    finally:
+        server.close()
 
 
 if __name__ == "__main__":